@@ -14,6 +14,44 @@ NAME_SUFFIXES = {"II", "III", "IV", "MD", "PhD", "Jr", "Sr"}
 NAME_PREFIXES = {"Dr", "Prof", "Mr", "Mrs", "Ms"}
 NAME_PARTICLES = {"von", "van", "de", "la", "das", "dos", "der", "den"}
 
+# Common nicknames and short forms mapped to the given name they stand for,
+# all lower-case; name parts with the same form match. Short forms of several
+# names (e.g. "alex" for Alexander and Alexandra) are left out
+NICKNAMES = {
+    "andy": "andrew",
+    "bill": "william",
+    "billy": "william",
+    "bob": "robert",
+    "bobby": "robert",
+    "danny": "daniel",
+    "dave": "david",
+    "fritz": "friedrich",
+    "hans": "johannes",
+    "jim": "james",
+    "jimmy": "james",
+    "joe": "joseph",
+    "kate": "katherine",
+    "katie": "katherine",
+    "liz": "elizabeth",
+    "maggie": "margaret",
+    "matt": "matthew",
+    "mike": "michael",
+    "nick": "nicholas",
+    "peggy": "margaret",
+    "rob": "robert",
+    "sepp": "josef",
+    "steve": "steven",
+    "sue": "susan",
+    "ted": "edward",
+    "tom": "thomas",
+    "tommy": "thomas",
+    "tony": "anthony",
+    "willi": "wilhelm",
+}
+
+# Contact fields holding (parts of) the contact's name
+NAME_FIELDS = frozenset({"Full Name", "FirstName", "LastName", "Name", "Structured Name"})
+
 # Country codes
 COUNTRY_PREFIXES = {
     # North America
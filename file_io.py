@@ -3,26 +3,47 @@
 ###################
 
 import csv
-from config import VCARD_FIELD_MAPPING
+from config import NAME_FIELDS, VCARD_FIELD_MAPPING
 import vobject
 
 # from process_address import string_to_address_dict  # Add this import
 import os  # Add this import
 from process_name import get_contact_name  # Add this import
 import logging
-import re  # Add this import
 from process_phone import normalize_phone_list  # Add this import
 from process_name import merge_names, capitalize_name  # Add this import
 
 
+class _PhoneSeparators(dict):
+    """str.translate table mapping everything but digits and '+' to a space.
+
+    Entries are filled in on first use, so any code point is handled while
+    the table only grows with the characters actually seen.
+    """
+
+    def __missing__(self, code):
+        char = chr(code)
+        value = code if char.isdecimal() or char == "+" else " "
+        self[code] = value
+        return value
+
+
+_PHONE_SEPARATORS = _PhoneSeparators()
+
+
 def format_phone_number(phone):
     """Format phone numbers to have spaces between groups and remove non-standard separators."""
     if not phone:
         return phone
     # Replace non-digit characters with space, then collapse multiple spaces
-    formatted = re.sub(r"[^\d+]", " ", phone)
-    formatted = re.sub(r"\s+", " ", formatted).strip()
-    return formatted
+    return " ".join(phone.translate(_PHONE_SEPARATORS).split())
+
+
+def _as_list(value):
+    """Return a multi-valued field as a list; empty values become []"""
+    if isinstance(value, list):
+        return value
+    return [value] if value else []
 
 
 def deduplicate_keeping_order(items):
@@ -31,16 +52,24 @@ def deduplicate_keeping_order(items):
     return [x for x in items if not (x in seen or seen.add(x))]
 
 
+# vCard properties read by parse_vcard as (property, contents key, field label)
+# tuples; vobject keeps a component's properties under lower-case names
+_VCARD_PROPERTIES = tuple(
+    (key, key.lower(), label) for key, label in VCARD_FIELD_MAPPING.items()
+)
+
+
 def parse_vcard(vcf_file):
     logging.debug(f"Parsing VCF file: {vcf_file}")
     contacts = []
     with open(vcf_file, "r", encoding="utf-8") as file:
-        vcard_data = file.read()
-        for vcard in vobject.readComponents(vcard_data):
+        # Cards are parsed one at a time straight from the file, so large
+        # exports are never held in memory as a whole
+        for vcard in vobject.readComponents(file):
             contact = {}
-            for key, label in VCARD_FIELD_MAPPING.items():
-                if hasattr(vcard, key.lower()):
-                    field = getattr(vcard, key.lower())
+            for key, name, label in _VCARD_PROPERTIES:
+                if name in vcard.contents:
+                    field = getattr(vcard, name)
                     logging.debug(f"Processing field: {key}")
                     if key == "N":  # Special handling for Name objects
                         logging.debug(f"Processing Name field: {field}")
@@ -154,14 +183,7 @@ def parse_vcard(vcf_file):
             # After processing all fields
             if "Address" in contact and contact["Address"]:
                 logging.debug(f"Contact has address: {contact['Address']}")
-            name_fields = [
-                "Full Name",
-                "Name",
-                "FirstName",
-                "LastName",
-                "Structured Name",
-            ]
-            if not any(contact.get(field) for field in name_fields):
+            if not any(contact.get(field) for field in NAME_FIELDS):
                 logging.debug("No name fields populated, constructing a pseudo-name.")
                 # Construct pseudo-name from available fields
                 pseudo_name = None
@@ -185,20 +207,11 @@ def parse_vcard(vcf_file):
                 logging.debug(f"Constructed pseudo-name: {pseudo_name}")
             # After processing fields, deduplicate phone numbers and emails
             if "Telephone" in contact:
-                phones = (
-                    contact["Telephone"]
-                    if isinstance(contact["Telephone"], list)
-                    else [contact["Telephone"]]
-                )
-                phones = [p for p in phones if p]  # Remove empty values
+                phones = [p for p in _as_list(contact["Telephone"]) if p]
                 contact["Telephone"] = deduplicate_keeping_order(phones)
 
             if "Email" in contact:
-                emails = (
-                    contact["Email"]
-                    if isinstance(contact["Email"], list)
-                    else [contact["Email"]]
-                )
+                emails = _as_list(contact["Email"])
                 emails = [e.lower().strip() for e in emails if e]  # Normalize emails
                 contact["Email"] = deduplicate_keeping_order(emails)
             contacts.append(contact)
@@ -215,9 +228,7 @@ def parse_vcard(vcf_file):
                         original = addr.get("OriginalAddress", "")
                         addr["OriginalAddress"] = original.replace("\n", " ").strip()
             # Normalize Telephone to ensure it's a flat list of strings
-            telephone = contact.get("Telephone", [])
-            if not isinstance(telephone, list):
-                telephone = [telephone] if telephone else []
+            telephone = _as_list(contact.get("Telephone"))
             contact["Telephone"] = normalize_phone_list(telephone)
     logging.info(f"Total contacts parsed from {vcf_file}: {len(contacts)}")
     return contacts
@@ -250,8 +261,10 @@ def save_to_csv(contacts, output_file):
     ]
 
     with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+        # Rows always hold every column, so they are written as plain lists in
+        # column order, without DictWriter checking each row's keys
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
 
         for contact in contacts:
             # Create row directly from contact fields, including ADR_ prefixed fields
@@ -306,7 +319,7 @@ def save_to_csv(contacts, output_file):
                     )
 
             logging.debug(f"Writing contact to CSV: {row}")
-            writer.writerow(row)
+            writer.writerow([row[field] for field in fieldnames])
     logging.info(f"Contacts saved to {output_file}")
 
 
@@ -367,9 +380,7 @@ def save_to_vcf(contacts, output_file):
                 )
 
                 # Email handling - preserve multiple emails
-                emails = contact.get("Email", [])
-                if not isinstance(emails, list):
-                    emails = [emails] if emails else []
+                emails = _as_list(contact.get("Email"))
                 emails = deduplicate_keeping_order([e for e in emails if e])
                 for email in emails:
                     if email:
@@ -378,9 +389,7 @@ def save_to_vcf(contacts, output_file):
                         email_field.params["TYPE"] = ["INTERNET"]
 
                 # Phone handling - preserve multiple numbers
-                phones = contact.get("Telephone", [])
-                if not isinstance(phones, list):
-                    phones = [phones] if phones else []
+                phones = _as_list(contact.get("Telephone"))
                 phones = deduplicate_keeping_order([p for p in phones if p])
                 formatted_phones = [format_phone_number(phone) for phone in phones]
                 for phone in formatted_phones:
@@ -6,7 +6,7 @@
 import os
 import argparse
 from file_io import parse_vcard, save_to_csv, save_to_vcf, save_address_validation_report
-from process_contact import process_contact, merge_duplicates
+from process_contact import process_contacts, merge_duplicates
 from validation import generate_merge_validation
 from process_address import AddressValidationMode
 
@@ -51,18 +51,15 @@ def main(input_paths, validation_mode=AddressValidationMode.FULL):
                     address_stats["ambiguous"] += 1
 
     # Process contacts
-    processed_contacts = []
-    for contact in all_contacts:
-        processed = process_contact(contact, validation_mode)
-        processed_contacts.append(processed)
-
-    all_contacts = processed_contacts
+    all_contacts = process_contacts(all_contacts, validation_mode)
 
     # Keep copy of original contacts for validation
     original_contacts = all_contacts.copy()
 
     # Merge contacts
-    all_contacts = merge_duplicates(all_contacts, validation_mode=validation_mode)
+    all_contacts, merge_report = merge_duplicates(
+        all_contacts, validation_mode=validation_mode
+    )
 
     # Save merged contacts
     output_csv = "output/merged_contacts.csv"
@@ -92,7 +89,9 @@ def main(input_paths, validation_mode=AddressValidationMode.FULL):
 
     # Generate and display merge validation
     print("\nGenerating merge validation report...")
-    generate_merge_validation(original_contacts, all_contacts)
+    generate_merge_validation(
+        original_contacts, all_contacts, merge_report=merge_report
+    )
 
 
 if __name__ == "__main__":
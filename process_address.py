@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 import os
 import requests
 from enum import Enum
+from functools import lru_cache
 import pycountry  # Add this import at the top
 
 # Configure logging first, before any other operations
@@ -203,17 +204,53 @@ def normalize_address(address, api_key, validation_mode=AddressValidationMode.FU
     return result
 
 
+WHITESPACE_PATTERN = re.compile(r"\s+")
+EMPTY_PART_PATTERN = re.compile(r",\s*,")
+TRAILING_COMMA_PATTERN = re.compile(r",\s*$")
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s,]")
+POSTAL_CODE_PATTERN = re.compile(r"\d{5}")
+
+
 def clean_address_string(address):
     """Clean up an address string"""
-    address = re.sub(r"\s+", " ", address).strip()
-    address = re.sub(r"\n", ", ", address)
-    address = re.sub(r",\s*,", ",", address)
-    address = re.sub(r",\s*$", "", address)
-    address = re.sub(r"[^\w\s,]", "", address)
+    # Collapsing whitespace also turns line breaks into spaces
+    address = WHITESPACE_PATTERN.sub(" ", address).strip()
+    address = EMPTY_PART_PATTERN.sub(",", address)
+    address = TRAILING_COMMA_PATTERN.sub("", address)
+    address = PUNCTUATION_PATTERN.sub("", address)
     return address
 
 
+class _ValidationFailed(Exception):
+    """Raised by _cached_validation so failed requests are not cached"""
+
+
 def validate_address(address, api_key, country=None):
+    """Validate an address with the API, None if validation failed
+
+    Successful results are cached, see _cached_validation; failures such as
+    rate limiting or server errors are retried when the address comes up
+    again. The returned dicts are shared between callers and must not be
+    modified.
+    """
+    try:
+        return _cached_validation(address, api_key, country)
+    except _ValidationFailed:
+        return None
+
+
+# Results are cached per (address, api_key, country), so duplicate addresses
+# across contacts are only sent to the API once per run. lru_cache doesn't
+# store calls that raise, which keeps failures out of the cache.
+@lru_cache(maxsize=50_000)
+def _cached_validation(address, api_key, country):
+    result = _request_validation(address, api_key, country)
+    if result is None:
+        raise _ValidationFailed
+    return result
+
+
+def _request_validation(address, api_key, country=None):
     if not address or not api_key:
         logging.error("Missing address or API key")
         return None
@@ -330,7 +367,7 @@ def parse_address_string(address_str):
         # Try to find postal code and city
         if parts:
             last_part = parts.pop()
-            if re.search(r"\d{5}", last_part):
+            if POSTAL_CODE_PATTERN.search(last_part):
                 components["postal_code"] = last_part
                 if parts:
                     components["city"] = parts.pop()
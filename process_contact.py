@@ -2,11 +2,19 @@
 # Contact Processing
 ###################
 
+from __future__ import annotations
+
 import os
 import re
+import sys
+import unicodedata
+import multiprocessing
+from array import array
+from collections import Counter, defaultdict
 from dotenv import load_dotenv
-from fuzzywuzzy import fuzz
-from math import prod
+from rapidfuzz import fuzz, process, utils
+from math import ceil, exp, fsum, log
+from config import NAME_FIELDS, NICKNAMES
 from process_address import (
     normalize_address,
     AddressValidationMode,
@@ -19,7 +27,6 @@ from process_phone import (
     normalize_phone_list,
 )
 import logging
-from difflib import SequenceMatcher
 from typing import Dict, Any
 
 
@@ -27,20 +34,270 @@ from typing import Dict, Any
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
 
+# Common gender-variant endings, as tuples so str.endswith checks them in one call
+FEMININE_ENDINGS = ("a", "ina", "elle", "ella", "ette")
+MASCULINE_ENDINGS = ("o", "us", "er", "or")
+
+# Weights of the fields scored by calculate_match_confidence
+MATCH_WEIGHTS = {
+    "email": 1.0,
+    "full_name": 1.0,
+    "first_last": 0.9,
+    "last_name": 0.6,
+    "first_name": 0.4,
+    "organization": 0.3,
+    "street": 0.3,
+    "city": 0.2,
+    "postal_code": 0.3,
+    "country": 0.1,
+}
+
+# Address fields scored by calculate_match_confidence, with their weights
+ADDRESS_MATCH_WEIGHTS = (
+    ("ADR_Street", MATCH_WEIGHTS["street"]),
+    ("ADR_Locality", MATCH_WEIGHTS["city"]),
+    ("ADR_PostalCode", MATCH_WEIGHTS["postal_code"]),
+    ("ADR_Country", MATCH_WEIGHTS["country"]),
+)
+
+# Address fields compared by their words regardless of order, e.g.
+# "42 Main St Apt 3" and "Apt 3 42 Main St"; Organization is compared the
+# same way
+TOKEN_MATCH_FIELDS = frozenset({"ADR_Street", "ADR_Locality"})
+
+
+# Share of a contact's name 3-grams another contact must have to be compared
+MIN_NGRAM_OVERLAP = 0.4
+
+# Number of contacts from which merge_duplicates compares them in parallel
+PARALLEL_MIN_CONTACTS = 2000
 
-def create_contact_index(contacts):
-    """Create name-based index for faster matching"""
-    index = {}
-    for contact in contacts:
-        name = get_contact_name(contact).lower()
-        first_chars = name[:3] if name else ""  # First 3 chars as block key
-        if first_chars:
-            if first_chars not in index:
-                index[first_chars] = []
-            index[first_chars].append(contact)
+
+def name_ngrams(name):
+    """Character 3-grams of a canonical name, or the name itself if shorter"""
+    if len(name) < 3:
+        return {name} if name else set()
+    return {name[k : k + 3] for k in range(len(name) - 2)}
+
+
+def create_contact_index(contact_ngrams):
+    """Create inverted index from name 3-gram to contact positions"""
+    index = defaultdict(list)
+    for i, ngrams in enumerate(contact_ngrams):
+        for ngram in ngrams:
+            index[ngram].append(i)
     return index
 
 
+# Titles and honorifics ignored when comparing name parts
+TITLE_PATTERN = re.compile(
+    r"\b(?:professor|prof|dr|mrs|mr|ms|phd|md|iii|ii|iv|i|v)\b\.?\s*"
+)
+
+
+def _name_parts(name):
+    """Parts of a canonical name compared by is_duplicate"""
+    name = TITLE_PATTERN.sub("", name)
+    return [p for p in name.split() if len(p) > 2]  # Ignore initials and short parts
+
+
+def _canonical_name(name):
+    """Unicode-normalized, case-folded form of a name used for matching
+
+    NFKC unifies composed and decomposed characters, and case folding also
+    maps e.g. "ß" to "ss". The result is interned, as equal names and name
+    parts are compared many times.
+    """
+    return sys.intern(unicodedata.normalize("NFKC", name).casefold().strip())
+
+
+def _expand_nicknames(words):
+    """Nickname forms of the words of a canonical name
+
+    Known nicknames among the given names become the name they stand for,
+    so that "Bob" and "Robert" have the same form; name parts with equal
+    forms match in addition to equal or similar ones. The family name is
+    kept, so that e.g. the surname "Bill" isn't read as "William": it is
+    everything up to the first comma in "Last, First" form, otherwise the
+    last word.
+    """
+    family = range(len(words) - 1, len(words))
+    for k, word in enumerate(words):
+        if word.endswith(","):
+            family = range(k + 1)
+            break
+    return [
+        word if k in family else NICKNAMES.get(word, word)
+        for k, word in enumerate(words)
+    ]
+
+
+def _prepare(contacts):
+    """Normalize the fields compared during matching, once per contact
+
+    Returns parallel lists with one entry per contact, keyed by field name.
+    """
+    names = [_canonical_name(get_contact_name(contact)) for contact in contacts]
+    parts = [list(map(sys.intern, _name_parts(name))) for name in names]
+    emails = [_normalize_emails(contact.get("Email", "")) for contact in contacts]
+    return {
+        "name": names,
+        "parts": parts,
+        "forms": [_expand_nicknames(name_parts) for name_parts in parts],
+        # Index the nickname forms, so that e.g. "Bob" finds "Robert"
+        "ngrams": [
+            name_ngrams(" ".join(_expand_nicknames(name.split()))) for name in names
+        ],
+        "phones": [
+            frozenset(normalize_phone_list(contact.get("Telephone", "")))
+            for contact in contacts
+        ],
+        "emails": emails,
+        "confidence": [
+            _confidence_fields(contact, contact_emails)
+            for contact, contact_emails in zip(contacts, emails)
+        ],
+    }
+
+
+def _normalize_emails(emails):
+    """Set of lower-cased addresses from an email list or comma-separated string"""
+    if isinstance(emails, str):
+        emails = emails.split(",")
+    return frozenset(e.strip().lower() for e in emails if e.strip())
+
+
+class DisjointSet:
+    """Union-find over contact positions, with path compression and union by rank"""
+
+    __slots__ = ("parent", "rank")
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.rank = [0] * size
+
+    def find(self, i):
+        """Return the representative of the set containing i"""
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i, j):
+        """Merge the sets containing i and j"""
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i == root_j:
+            return
+        if self.rank[root_i] < self.rank[root_j]:
+            root_i, root_j = root_j, root_i
+        self.parent[root_j] = root_i
+        if self.rank[root_i] == self.rank[root_j]:
+            self.rank[root_i] += 1
+
+
+def _potential_matches(i, prepared, contact_index, phone_index):
+    """Positions of the contacts worth comparing with the contact at position i"""
+    ngrams = prepared["ngrams"][i]
+    if not ngrams:
+        return []
+
+    # Potential matches share enough of the contact's name 3-grams
+    overlap = Counter()
+    for ngram in ngrams:
+        overlap.update(contact_index.get(ngram, ()))
+    min_overlap = ceil(MIN_NGRAM_OVERLAP * len(ngrams))
+    potential_matches = [j for j, count in overlap.items() if count >= min_overlap]
+    # Contacts sharing a phone number need fewer matching name parts, so
+    # they are potential matches regardless of their name 3-grams
+    for phone in prepared["phones"][i]:
+        potential_matches.extend(phone_index[phone])
+
+    return [j for j in dict.fromkeys(potential_matches) if j != i]
+
+
+def _matching_positions(i, prepared, contact_index, phone_index):
+    """Positions of the contacts that are duplicates of the contact at position i
+
+    Decides like _is_duplicate_at, but scores the name parts of all potential
+    matches in a single cdist call and counts the matching part pairs from it.
+    """
+    parts = prepared["parts"][i]
+    owners = []
+    choices = []
+    choice_forms = []
+    for j in _potential_matches(i, prepared, contact_index, phone_index):
+        owners.extend([j] * len(prepared["parts"][j]))
+        choices.extend(prepared["parts"][j])
+        choice_forms.extend(prepared["forms"][j])
+    if not parts or not choices:
+        return []
+
+    # Number of matching part pairs per potential match; equal parts score 100
+    scores = process.cdist(parts, choices, scorer=fuzz.ratio, score_cutoff=80)
+    matching_parts = defaultdict(int)
+    for j, count in zip(owners, (scores > 80).sum(axis=0)):
+        if count:
+            matching_parts[j] += int(count)
+
+    # Pairs with equal nickname forms match too, unless already counted
+    columns_by_form = defaultdict(list)
+    for column, form in enumerate(choice_forms):
+        columns_by_form[form].append(column)
+    for row, form in enumerate(prepared["forms"][i]):
+        for column in columns_by_form.get(form, ()):
+            if not scores[row, column] > 80:
+                matching_parts[owners[column]] += 1
+
+    phones = prepared["phones"][i]
+    matches = []
+    for j, count in matching_parts.items():
+        total_parts = max(len(parts), len(prepared["parts"][j]))
+        min_ratio = 0.33 if not phones.isdisjoint(prepared["phones"][j]) else 0.67
+        if count / total_parts >= min_ratio:
+            matches.append(j)
+    return matches
+
+
+# Prepared fields and indexes of the merge, set in each worker process
+_match_worker_state = None
+
+
+def _init_match_worker(prepared, contact_index, phone_index):
+    global _match_worker_state
+    _match_worker_state = (prepared, contact_index, phone_index)
+
+
+def _find_matches(positions):
+    """Matching pairs for the contacts at the given positions, run in a worker"""
+    return [
+        (i, j) for i in positions for j in _matching_positions(i, *_match_worker_state)
+    ]
+
+
+def _find_matches_parallel(prepared, contact_index, phone_index):
+    """Yield all matching pairs, comparing chunks of contacts in a process pool"""
+    n = len(prepared["name"])
+    processes = os.cpu_count() or 1
+    chunk_size = ceil(n / (processes * 4))
+    chunks = [range(k, min(k + chunk_size, n)) for k in range(0, n, chunk_size)]
+
+    # Prefer forking: spawned workers re-import process_address, whose logging
+    # setup would truncate the address validation log of this run
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(
+        processes,
+        initializer=_init_match_worker,
+        initargs=(prepared, contact_index, phone_index),
+    ) as pool:
+        for pairs in pool.imap(_find_matches, chunks):
+            yield from pairs
+
+
 def extract_name_variants(contact):
     """Extract all name-related fields from a contact"""
     variants = set()
@@ -65,43 +322,122 @@ def extract_name_variants(contact):
     return variants
 
 
-def merge_contact_group(duplicates, validation_mode=AddressValidationMode.FULL):
-    merged_contact = {}
-    confidence_scores = []
+def _canonicalize(contact):
+    """Return a copy of a contact with stripped values and empty fields dropped
+
+    Empty name fields are kept: without them get_contact_name would fall
+    back to "Unknown", and all nameless contacts would match each other.
+    """
+    canonical = {}
+    for key, value in contact.items():
+        if isinstance(value, str):
+            value = value.strip()
+        elif isinstance(value, list):
+            value = [v.strip() if isinstance(v, str) else v for v in value]
+            value = [v for v in value if v]
+        if value or key in NAME_FIELDS:
+            canonical[key] = value
+    return canonical
+
+
+def _stringify(values):
+    # Values are canonical (stripped, non-empty); only non-strings such as
+    # flags still need converting
+    return [v if isinstance(v, str) else str(v) for v in values]
+
+
+def _merge_values(values):
+    """Merge a field's values from all contacts of a group"""
+    values = _stringify(values)
+    return values[0] if len(values) == 1 else values
+
+
+def _merge_name_values(values):
+    """Keep every distinct name variant, joined once"""
+    return ", ".join(filter(None, dict.fromkeys(values)))
+
 
-    # First collect and normalize all name variants
-    first_names = set()
-    last_names = set()
+def _merge_emails(values):
+    """Keep each address of the group once, ignoring case, in first-seen order"""
+    emails = {}
+    for value in values:
+        for email in value if isinstance(value, list) else value.split(","):
+            email = str(email).strip()
+            if email:
+                emails.setdefault(email.lower(), email)
+    merged = list(emails.values())
+    return merged[0] if len(merged) == 1 else merged
 
+
+def _merge_phones(values):
+    """Normalize all numbers of the group in one call and deduplicate"""
+    return list(dict.fromkeys(normalize_phone_list(values)))
+
+
+def _merge_addresses(values):
+    """Keep all addresses of the group"""
+    return _stringify(values)
+
+
+# Field-specific merge functions, _merge_values for all other fields
+FIELD_MERGERS = {
+    **dict.fromkeys(NAME_FIELDS, _merge_name_values),
+    "Email": _merge_emails,
+    "Telephone": _merge_phones,
+    "Address": _merge_addresses,
+}
+
+
+def merge_contact_group(
+    duplicates, validation_mode=AddressValidationMode.FULL, confidence_scores=None
+):
+    merged_contact = {}
+
+    # Single pass over the group: collect every non-empty value per field
+    by_field = defaultdict(list)
     for duplicate in duplicates:
-        # Handle FirstName and LastName fields
-        if duplicate.get("FirstName"):
-            names = [
-                n.strip() for n in duplicate["FirstName"].replace("\\,", ",").split(",")
-            ]
-            first_names.update(names)
-
-        if duplicate.get("LastName"):
-            names = [
-                n.strip() for n in duplicate["LastName"].replace("\\,", ",").split(",")
-            ]
-            last_names.update(names)
-
-        # Also process full names if available
-        if duplicate.get("Full Name"):
-            full = duplicate["Full Name"].replace("\\,", ",")
-            if "," in full:
-                # If comma-separated, assume "LastName, FirstName" format
-                parts = [p.strip() for p in full.split(",")]
-                if len(parts) == 2:
-                    last_names.add(parts[0])
-                    first_names.add(parts[1])
-            else:
-                # Otherwise split by space and take last word as last name
-                parts = full.split()
-                if len(parts) > 1:
-                    first_names.add(" ".join(parts[:-1]))
-                    last_names.add(parts[-1])
+        for key, value in duplicate.items():
+            if value:
+                by_field[key].append(value)
+
+    # Without the match confidences recorded during grouping, score every
+    # contact of the group against the first one
+    if confidence_scores is None:
+        anchor_fields = _confidence_fields(duplicates[0])
+        confidence_scores = [
+            _score_match_confidence(anchor_fields, _confidence_fields(duplicate))
+            for duplicate in duplicates
+        ]
+
+    # Collect first and last name variants (dict keys keep first-seen order)
+    first_names = {}
+    last_names = {}
+
+    for value in by_field.get("FirstName", ()):
+        first_names.update(
+            dict.fromkeys(n.strip() for n in value.replace("\\,", ",").split(","))
+        )
+
+    for value in by_field.get("LastName", ()):
+        last_names.update(
+            dict.fromkeys(n.strip() for n in value.replace("\\,", ",").split(","))
+        )
+
+    # Also process full names if available
+    for full in by_field.get("Full Name", ()):
+        full = full.replace("\\,", ",")
+        if "," in full:
+            # If comma-separated, assume "LastName, FirstName" format
+            parts = [p.strip() for p in full.split(",")]
+            if len(parts) == 2:
+                last_names[parts[0]] = None
+                first_names[parts[1]] = None
+        else:
+            # Otherwise split by space and take last word as last name
+            parts = full.split()
+            if len(parts) > 1:
+                first_names[" ".join(parts[:-1])] = None
+                last_names[parts[-1]] = None
 
     # Merge first and last names separately
     if first_names:
@@ -128,193 +464,157 @@ def merge_contact_group(duplicates, validation_mode=AddressValidationMode.FULL):
         merged_contact["Full Name"] = " ".join(full_name_parts)
         merged_contact["Name"] = merged_contact["Full Name"]
 
-    # Collect all name variants first
-    all_names = {
-        "Full Name": set(),
-        "FirstName": set(),
-        "LastName": set(),
-        "Name": set(),
-        "Structured Name": set(),
-    }
-
     # Initialize empty address list in merged contact
     merged_contact["Address"] = []
 
-    # First pass: collect all name components
-    for duplicate in duplicates:
-        for key in all_names.keys():
-            if key in duplicate and duplicate[key]:
-                all_names[key].add(duplicate[key])
+    for key, values in by_field.items():
+        merged_contact[key] = FIELD_MERGERS.get(key, _merge_values)(values)
 
-    # Regular merge process with modified name handling
-    for duplicate in duplicates:
-        for key, value in duplicate.items():
-            if not value or str(value).strip() == "":
-                continue  # Skip empty fields
-
-            value = str(value).strip()
-            if key in merged_contact:
-                if isinstance(merged_contact[key], list):
-                    merged_contact[key].append(value)
-                else:
-                    merged_contact[key] = [merged_contact[key], value]
-            else:
-                merged_contact[key] = value
-
-        # Collect confidence scores for the merged contact
-        match_details = is_duplicate_with_confidence(duplicates[0], duplicate)
-        confidence_scores.append(match_details["confidence"])
-
-    # Ensure name components are properly joined
-    for key in all_names.keys():
-        if all_names[key]:
-            merged_contact[key] = ", ".join(filter(None, all_names[key]))
-
-    # Normalize Telephone to be a flat list of strings
-    if "Telephone" in merged_contact:
-        # Convert to set to remove duplicates, then back to list
-        phone_numbers = merged_contact["Telephone"]
-        if not isinstance(phone_numbers, list):
-            phone_numbers = [phone_numbers]
-            
-        # Normalize and deduplicate phone numbers
-        normalized_phones = []
-        seen_phones = set()
-        
-        for phone in normalize_phone_list(phone_numbers):
-            if phone not in seen_phones:
-                seen_phones.add(phone)
-                normalized_phones.append(phone)
-                
-        merged_contact["Telephone"] = normalized_phones
-
-    # Calculate overall confidence for the merged contact using geometric mean
-    merged_contact["Match Confidence"] = (
-        prod(confidence_scores) ** (1 / len(confidence_scores))
-        if confidence_scores
-        else 0
-    )
+    # Calculate overall confidence for the merged contact using geometric
+    # mean, averaged in log space so large groups don't underflow to 0; a
+    # zero score makes the mean 0, which the log can't express
+    if not confidence_scores:
+        merged_contact["Match Confidence"] = 0
+    elif min(confidence_scores) <= 0.0:
+        merged_contact["Match Confidence"] = 0.0
+    else:
+        merged_contact["Match Confidence"] = exp(
+            fsum(map(log, confidence_scores)) / len(confidence_scores)
+        )
     return merged_contact
 
 
 def merge_duplicates(
     contacts: list, validation_mode=AddressValidationMode.FULL
-) -> list:
-    """Optimized duplicate detection and merging"""
-    if not contacts:
-        return []
+) -> tuple:
+    """Optimized duplicate detection and merging
 
-    # Create contact index and mapping of merged contacts
-    contact_index = create_contact_index(contacts)
-    merged_groups_map = {}  # Track which contacts belong to which merged group
-
-    # Cache for comparison results
-    comparison_cache = {}
-    processed = set()
-    merged_groups = []
-
-    for contact in contacts:
-        if id(contact) in processed:
-            continue
-
-        name = get_contact_name(contact).lower()
-        first_chars = name[:3] if name else ""
-
-        # Initialize new group with current contact
-        current_group = [contact]
-        merged_groups_map[id(contact)] = len(merged_groups)  # Map contact to its group
-
-        # Find and process all matches for this contact
-        if first_chars:
-            # Get potential matches from index
-            potential_matches = contact_index.get(first_chars, []).copy()
-            # Add matches from similar blocks for typo handling
-            for i in range(len(first_chars)):
-                variant = first_chars[:i] + first_chars[i + 1 :]
-                potential_matches.extend(contact_index.get(variant, []))
-
-            # Check all potential matches
-            for other in potential_matches:
-                if id(other) != id(contact) and id(other) not in processed:
-                    if is_duplicate(contact, other, comparison_cache):
-                        current_group.append(other)  # Added missing code
-                        merged_groups_map[id(other)] = len(merged_groups)
-                        processed.add(id(other))
-
-        if len(current_group) > 1:
-            merged_groups.append(current_group)
-        processed.add(id(contact))
-
-    # Store the merged groups mapping for later use in validation
-    # We'll store it as a global or class variable
-    global _merged_groups_mapping
-    _merged_groups_mapping = {"groups": merged_groups, "map": merged_groups_map}
+    Returns the merged contacts and a merge report for validation, holding
+    the groups of merged original contacts ("groups") and every contact's
+    group number or -1 ("map").
+    """
+    if not contacts:
+        return [], {"groups": [], "map": array("i")}
+
+    # Normalize field values once, so the matching and merging code can rely
+    # on stripped, non-empty values
+    contacts = [_canonicalize(contact) for contact in contacts]
+    prepared = _prepare(contacts)
+
+    # Create contact indexes and union-find over contact positions
+    contact_index = create_contact_index(prepared["ngrams"])
+    phone_index = defaultdict(list)
+    for i, phones in enumerate(prepared["phones"]):
+        for phone in phones:
+            phone_index[phone].append(i)
+    groups = DisjointSet(len(contacts))
+    matches = []  # Matching pairs, scored for the merged contacts' confidence
+
+    # Contacts sharing an email address are duplicates without any fuzzy
+    # matching; later comparisons skip pairs already in the same group
+    email_index = defaultdict(list)
+    for i, emails in enumerate(prepared["emails"]):
+        for email in emails:
+            email_index[email].append(i)
+    for positions in email_index.values():
+        for j in positions[1:]:
+            if groups.find(positions[0]) != groups.find(j):
+                groups.union(positions[0], j)
+                matches.append((positions[0], j))
+
+    n = len(contacts)
+    if n >= PARALLEL_MIN_CONTACTS:
+        # Compare in worker processes; pairs arrive in contact order and are
+        # grouped here exactly as in the sequential loop below
+        for i, j in _find_matches_parallel(prepared, contact_index, phone_index):
+            if groups.find(i) != groups.find(j):
+                groups.union(i, j)
+                matches.append((i, j))
+    else:
+        for i in range(n):
+            for j in _matching_positions(i, prepared, contact_index, phone_index):
+                if groups.find(i) != groups.find(j):
+                    groups.union(i, j)
+                    matches.append((i, j))
+
+    # Collect groups of contact positions in order of their first contact
+    members = defaultdict(list)
+    for i in range(n):
+        members[groups.find(i)].append(i)
+    group_roots = [root for root, positions in members.items() if len(positions) > 1]
+
+    # Group number of every contact position, -1 for contacts without duplicates
+    group_of = array("i", [-1]) * n
+    for group_idx, root in enumerate(group_roots):
+        for i in members[root]:
+            group_of[i] = group_idx
+    merged_groups = [[contacts[i] for i in members[root]] for root in group_roots]
+
+    # Score the match confidence of every matching pair, per group
+    confidences = defaultdict(list)
+    for i, j in matches:
+        confidences[groups.find(i)].append(
+            _score_match_confidence(
+                prepared["confidence"][i], prepared["confidence"][j]
+            )
+        )
 
     # Merge groups and remaining contacts
     result = []
-    processed_in_groups = {id(c) for g in merged_groups for c in g}
 
     # Add merged groups
-    for group in merged_groups:
-        result.append(merge_contact_group(group, validation_mode))
+    for group, root in zip(merged_groups, group_roots):
+        result.append(merge_contact_group(group, validation_mode, confidences[root]))
 
     # Add non-duplicate contacts
-    for contact in contacts:
-        if id(contact) not in processed_in_groups:
+    for i, contact in enumerate(contacts):
+        if group_of[i] < 0:
             result.append(contact)
 
-    return result
+    return result, {"groups": merged_groups, "map": group_of}
 
 
-def is_name_gender_variant(name1, name2):
+def is_name_gender_variant(name1: str, name2: str) -> bool:
     """Check if names might be gender variants (e.g., Antonio/Antonia)"""
-    # Common gender-variant endings
-    feminine_endings = {"a", "ina", "elle", "ella", "ette"}
-    masculine_endings = {"o", "us", "er", "or"}
-
     # Get the longer and shorter name for comparison
-    n1, n2 = sorted([name1.lower(), name2.lower()], key=len, reverse=True)
+    n1, n2 = name1.lower(), name2.lower()
+    if len(n1) < len(n2):
+        n1, n2 = n2, n1
 
     # If names are identical except for the ending
     if n1[:-1] == n2 or n1[:-2] == n2:
-        # Check if one ends with feminine ending and the other doesn't
-        n1_has_fem = any(n1.endswith(end) for end in feminine_endings)
-        n2_has_fem = any(n2.endswith(end) for end in feminine_endings)
-        n1_has_masc = any(n1.endswith(end) for end in masculine_endings)
-        n2_has_masc = any(n2.endswith(end) for end in masculine_endings)
-
         # If one name has feminine ending and other has masculine, they're likely variants
-        if (n1_has_fem and n2_has_masc) or (n1_has_masc and n2_has_fem):
-            return True
+        if n1.endswith(FEMININE_ENDINGS):
+            return n2.endswith(MASCULINE_ENDINGS)
+        if n1.endswith(MASCULINE_ENDINGS):
+            return n2.endswith(FEMININE_ENDINGS)
 
     return False
 
 
-def is_likely_nickname(name1, name2):
+def is_likely_nickname(name1: str, name2: str) -> bool:
     """Check if names might be nickname variants (e.g., Jonathan/Jona, Christopher/Chris)"""
     # Common nickname patterns
     if not name1 or not name2:
         return False
 
     # Get shorter and longer name
-    short, long = sorted(
-        [name1.lower(), name2.lower()], key=len
-    )  # Fix: key.len -> key=len
-
-    # If one name is contained within the other but they're not the same
-    if short != long and (short in long or long.startswith(short)):
-        # Require at least 3 chars to match to avoid false positives
-        if len(short) >= 3:
-            # Calculate what portion of the shorter name matches
-            match_ratio = len(short) / len(long)
-            # If less than 80% match, likely a nickname variation
-            if match_ratio < 0.8:
-                return True
+    short, long = name1.lower(), name2.lower()
+    if len(long) < len(short):
+        short, long = long, short
+
+    # Require at least 3 chars to match to avoid false positives, and less
+    # than 80% length coverage to count as a nickname variation. Both gates
+    # only need the lengths, so check them before searching the string.
+    if len(short) < 3 or 5 * len(short) >= 4 * len(long):
+        return False
 
-    return False
+    # A prefix is also a substring, so a single containment check covers
+    # both the "Chris"/"Christopher" and the "Jona"/"Jonathan" case
+    return short in long
 
 
-def split_name_variants(name):
+def split_name_variants(name: str) -> list[str]:
     """Split name into variants, handling comma-separated lists"""
     variants = []
     # First split by commas
@@ -326,19 +626,31 @@ def split_name_variants(name):
     return variants
 
 
-def has_conflicting_names(name1_parts, name2_parts):
+def has_conflicting_names(name1_parts: list[str], name2_parts: list[str]) -> bool:
     """Check if any name parts are gender variants or too different"""
+    if not name1_parts or not name2_parts:
+        return False
+
+    # If any pair of names are gender variants, or too different in length
+    # to score 30 (the ratio is at most 2 * shorter / (shorter + longer)),
+    # names conflict
     for n1 in name1_parts:
         for n2 in name2_parts:
-            if n1 != n2:  # Don't compare same names
-                # If any pair of names are gender variants, names conflict
-                if is_name_gender_variant(n1, n2):
-                    return True
-                # If any pair of names are too different, names conflict
-                similarity = fuzz.ratio(n1, n2) / 100
-                if similarity < 0.3:
-                    return True
-    return False
+            if n1 == n2:
+                continue
+            len1, len2 = len(n1), len(n2)
+            if 17 * min(len1, len2) < 3 * max(len1, len2):
+                return True
+            if is_name_gender_variant(n1, n2):
+                return True
+
+    # If any pair of names are too different, names conflict. All pairs are
+    # scored in one call; scores under the cutoff are returned as 0, and
+    # identical names always score 100.
+    scores = process.cdist(
+        name1_parts, name2_parts, scorer=fuzz.ratio, score_cutoff=30
+    )
+    return bool((scores < 30).any())
 
 
 def is_duplicate(
@@ -348,105 +660,177 @@ def is_duplicate(
     name_ratio=85,
     nickname_ratio=90,
     org_ratio=95,
+    scorer=None,
 ):
-    """Check for duplicates based on matching name parts and phone numbers"""
+    """Check for duplicates based on matching name parts and phone numbers
+
+    Name parts match if they are equal or more than 80% similar. scorer can
+    replace the default fuzz.ratio with any other function returning
+    a 0-100 score, e.g. rapidfuzz.fuzz.WRatio or a Jaro-Winkler similarity.
+
+    comparison_cache is owned by the caller and keyed by the contacts' ids
+    and the scorer, so it must not outlive the contacts compared. Any
+    mutable mapping works; pass a bounded one when comparing many pairs.
+    merge_duplicates doesn't use it, as it compares each candidate pair
+    only once.
+    """
     if not contact1 or not contact2:
         return False
 
     # Cache check
     cache_key = None
     if comparison_cache is not None:
-        cache_key = tuple(sorted([id(contact1), id(contact2)]))
+        # Pack both ids into one int, smaller id in the high bits; a custom
+        # scorer is part of the key, as results differ between scorers
+        id1, id2 = id(contact1), id(contact2)
+        pair = (id1 << 64) | id2 if id1 < id2 else (id2 << 64) | id1
+        cache_key = pair if scorer is None else (pair, scorer)
         if cache_key in comparison_cache:
             return comparison_cache[cache_key]
 
-    # Get names and normalize them
-    name1 = get_contact_name(contact1).lower()
-    name2 = get_contact_name(contact2).lower()
-
-    # Remove common titles and honorifics
-    titles = {
-        "prof",
-        "dr",
-        "professor",
-        "mr",
-        "mrs",
-        "ms",
-        "phd",
-        "md",
-        "i",
-        "ii",
-        "iii",
-        "iv",
-        "v",
-    }
-    for title in titles:
-        name1 = re.sub(rf"\b{title}\b\.?\s*", "", name1)
-        name2 = re.sub(rf"\b{title}\b\.?\s*", "", name2)
+    # Name parts decide most pairs; phone numbers are only normalized for
+    # pairs where a shared phone would tip the balance
+    parts1 = _name_parts(_canonical_name(get_contact_name(contact1)))
+    parts2 = _name_parts(_canonical_name(get_contact_name(contact2)))
+    forms1 = _expand_nicknames(parts1)
+    forms2 = _expand_nicknames(parts2)
+    total_parts = max(len(parts1), len(parts2))
+    name_match_ratio = 0
+    if total_parts:
+        # Equal forms are found by hashing; they alone often prove a match
+        name_match_ratio = _count_equal_parts(forms1, forms2) / total_parts
+        if name_match_ratio < 0.67:
+            matching_parts = _count_matching_parts(
+                parts1, parts2, scorer, forms1, forms2
+            )
+            name_match_ratio = matching_parts / total_parts
+
+    if name_match_ratio >= 0.67:
+        result = True
+    elif name_match_ratio < 0.33:
+        result = False
+    else:
+        phones1 = normalize_phone_list(contact1.get("Telephone", ""))
+        phones2 = normalize_phone_list(contact2.get("Telephone", ""))
+        result = not set(phones1).isdisjoint(phones2)
 
-    # Split names into parts and remove empty/short parts
-    parts1 = [p for p in name1.split() if len(p) > 2]  # Ignore initials and short parts
-    parts2 = [p for p in name2.split() if len(p) > 2]
+    if comparison_cache is not None and cache_key is not None:
+        comparison_cache[cache_key] = result
+    return result
+
+
+def _count_equal_parts(parts1, parts2):
+    """Number of pairs of equal name parts, a lower bound of the matching ones
+
+    Pass the parts' nickname forms to count the pairs with equal forms.
+    """
+    common = set(parts1).intersection(parts2)
+    return sum(parts1.count(p) * parts2.count(p) for p in common)
+
+
+def _count_matching_parts(parts1, parts2, scorer=None, forms1=None, forms2=None):
+    """Number of pairs of name parts that are equal or more than 80% similar
+
+    forms1 and forms2 are the parts' nickname forms (see _expand_nicknames);
+    pairs with equal forms match as well. Scores use the parts themselves.
+    """
+    if not parts1 or not parts2:
+        return 0
+    forms1 = parts1 if forms1 is None else forms1
+    forms2 = parts2 if forms2 is None else forms2
+    if scorer is not None:
+        return sum(
+            1
+            for p1, f1 in zip(parts1, forms1)
+            for p2, f2 in zip(parts2, forms2)
+            if p1 == p2 or f1 == f2 or scorer(p1, p2) > 80
+        )
 
-    # Count matching parts
-    matching_parts = sum(
+    # Score all pairs in one call; equal parts score 100, and the cutoff lets
+    # RapidFuzz skip pairs whose lengths already rule out a match
+    scores = process.cdist(parts1, parts2, scorer=fuzz.ratio, score_cutoff=80)
+    equal_forms = sum(
         1
-        for p1 in parts1
-        for p2 in parts2
-        if p1 == p2 or string_similarity(p1, p2) > 0.8
+        for row, f1 in enumerate(forms1)
+        for column, f2 in enumerate(forms2)
+        if f1 == f2 and not scores[row, column] > 80
     )
+    return int((scores > 80).sum()) + equal_forms
 
-    # Calculate match ratio based on the number of matching parts
-    total_parts = max(len(parts1), len(parts2))
-    name_match_ratio = matching_parts / total_parts if total_parts > 0 else 0
 
-    # Check phone numbers
-    phones1 = set(normalize_phone_list(contact1.get("Telephone", "")))
-    phones2 = set(normalize_phone_list(contact2.get("Telephone", "")))
-    have_matching_phones = bool(phones1 and phones2 and phones1.intersection(phones2))
+def _is_duplicate_at(i, j, prepared, scorer=None):
+    """is_duplicate for the contacts at positions i and j of prepared fields"""
+    # Normalized name parts, ignoring titles, initials and short parts
+    parts1 = prepared["parts"][i]
+    parts2 = prepared["parts"][j]
+    forms1 = prepared["forms"][i]
+    forms2 = prepared["forms"][j]
+
+    total_parts = max(len(parts1), len(parts2))
+    if not total_parts:
+        return False
 
     # Consider it a match if:
     # 1. Phone numbers match exactly AND at least 1/3 of name parts match
     # 2. OR more than 2/3 of name parts match exactly
-    result = (
-        have_matching_phones and name_match_ratio >= 0.33
-    ) or name_match_ratio >= 0.67
+    have_matching_phones = not prepared["phones"][i].isdisjoint(prepared["phones"][j])
+    min_ratio = 0.33 if have_matching_phones else 0.67
 
-    if comparison_cache is not None and cache_key is not None:
-        comparison_cache[cache_key] = result
-    return result
+    # Equal forms are found by hashing; they alone often prove a match
+    if _count_equal_parts(forms1, forms2) / total_parts >= min_ratio:
+        return True
+    matching_parts = _count_matching_parts(parts1, parts2, scorer, forms1, forms2)
+    return matching_parts / total_parts >= min_ratio
 
 
 # ...existing code...
 
 
 def is_duplicate_with_confidence(contact1, contact2, ratios=None):
-    """Check if two contacts are duplicates and return match details with confidence score"""
-    if ratios is None:
-        ratios = {
-            "name": 85,  # default threshold for name matching
-            "nickname": 90,  # higher threshold for nicknames
-            "org": 95,  # highest threshold for organization names
-        }
-
-    match = is_duplicate(
-        contact1,
-        contact2,
-        name_ratio=ratios["name"],
-        nickname_ratio=ratios["nickname"],
-        org_ratio=ratios["org"],
-    )
+    """Check if two contacts are duplicates and return match details with confidence score
+
+    ratios ({"name", "nickname", "org"} thresholds) is accepted like
+    is_duplicate's ratio arguments; the name part matching doesn't use it.
+    """
+    # Normalize both contacts once for the duplicate check and the score
+    prepared = _prepare([contact1, contact2])
 
     return {
-        "is_match": match,
-        "confidence": calculate_match_confidence(contact1, contact2),
+        "is_match": bool(contact1 and contact2) and _is_duplicate_at(0, 1, prepared),
+        "confidence": _score_match_confidence(*prepared["confidence"]),
     }
 
 
 def string_similarity(s1: str, s2: str) -> float:
     if not s1 or not s2:
         return 0.0
-    return SequenceMatcher(None, s1.lower(), s2.lower()).ratio()
+    return fuzz.ratio(s1, s2, processor=utils.default_process) / 100.0
+
+
+def _ratio(s1: str, s2: str) -> float:
+    """string_similarity for processed strings, 0.0 if it can't exceed 0.8
+
+    Confidence scoring only counts similarities above 0.8. The ratio is at
+    most 2 * shorter / (shorter + longer), so strings whose lengths differ too
+    much are rejected without comparing them, and RapidFuzz can stop early
+    on the others.
+    """
+    if not s1 or not s2:
+        return 0.0
+    len1, len2 = len(s1), len(s2)
+    if 3 * min(len1, len2) <= 2 * max(len1, len2):
+        return 0.0
+    return fuzz.ratio(s1, s2, score_cutoff=80) / 100.0
+
+
+def _token_ratio(s1: str, s2: str) -> float:
+    """Token set similarity, ignoring word order, punctuation and repeated words
+
+    Like _ratio, scores of 0.8 or below are returned as 0.0.
+    """
+    if not s1 or not s2:
+        return 0.0
+    return fuzz.token_set_ratio(s1, s2, score_cutoff=80) / 100.0
 
 
 def calculate_match_confidence(
@@ -456,74 +840,100 @@ def calculate_match_confidence(
     Calculate match confidence between two contacts using weighted scoring.
     Returns a float between 0.0 and 1.0
     """
+    return _score_match_confidence(
+        _confidence_fields(contact1), _confidence_fields(contact2)
+    )
+
+
+def _confidence_fields(contact: Dict[str, Any], emails=None) -> tuple:
+    """Extract the fields scored by calculate_match_confidence, once per contact
+
+    Text fields go through RapidFuzz's default processor (lower-case, no
+    punctuation, trimmed) here, so scoring a pair doesn't have to. Emails
+    are compared exactly, as the set built by _normalize_emails; pass it as
+    emails if it is at hand already.
+    """
+    if emails is None:
+        emails = _normalize_emails(contact.get("Email", ""))
+    return (
+        emails,
+        utils.default_process(_field_text(contact.get("Full Name"))),
+        utils.default_process(_field_text(contact.get("FirstName"))),
+        utils.default_process(_field_text(contact.get("LastName"))),
+        utils.default_process(_field_text(contact.get("Organization"))),
+    ) + tuple(
+        utils.default_process(_field_text(contact.get(field)))
+        for field, _ in ADDRESS_MATCH_WEIGHTS
+    )
+
+
+def _field_text(value) -> str:
+    """A field value as a string; list values, e.g. from vCards, are joined"""
+    if not value:
+        return ""
+    if isinstance(value, list):
+        return " ".join(map(str, value))
+    return str(value)
+
+
+def _score_match_confidence(fields1: tuple, fields2: tuple) -> float:
+    """Weighted match score of two _confidence_fields tuples"""
+    email1, full_name1, first1, last1, org1 = fields1[:5]
+    email2, full_name2, first2, last2, org2 = fields2[:5]
     score = 0.0
-    weights = {
-        "email": 1.0,
-        "full_name": 1.0,
-        "first_last": 0.9,
-        "last_name": 0.6,
-        "first_name": 0.4,
-        "organization": 0.3,
-        "street": 0.3,
-        "city": 0.2,
-        "postal_code": 0.3,
-        "country": 0.1,
-    }
 
-    # Email comparison (exact match)
-    if contact1.get("Email") and contact2.get("Email"):
-        if contact1["Email"].lower() == contact2["Email"].lower():
-            score += weights["email"]
+    # Email comparison (exact match of any address)
+    if not email1.isdisjoint(email2):
+        score += MATCH_WEIGHTS["email"]
+    # Every weight adds to the score, so once it reaches the cap the
+    # remaining comparisons can't change the result
+    if score >= 1.0:
+        return 1.0
 
-    # Name comparisons with fuzzy matching
-    full_name1 = contact1.get("Full Name", "")
-    full_name2 = contact2.get("Full Name", "")
+    # Name comparisons with fuzzy matching; full names are compared with
+    # their words sorted, so "Wong Li Wei" and "Li Wei Wong" are the same name
     if full_name1 and full_name2:
-        similarity = string_similarity(full_name1, full_name2)
-        if similarity > 0.9:
-            score += weights["full_name"] * similarity
+        similarity = fuzz.token_sort_ratio(full_name1, full_name2, score_cutoff=90)
+        if similarity > 90:
+            score += MATCH_WEIGHTS["full_name"] * similarity / 100.0
+    # An exact full-name match alone reaches the cap
+    if score >= 1.0:
+        return 1.0
 
     # First + Last name comparison
-    first1 = contact1.get("FirstName", "")
-    first2 = contact2.get("FirstName", "")
-    last1 = contact1.get("LastName", "")
-    last2 = contact2.get("LastName", "")
-
     if first1 and first2 and last1 and last2:
-        first_sim = string_similarity(first1, first2)
-        last_sim = string_similarity(last1, last2)
+        first_sim = _ratio(first1, first2)
+        last_sim = _ratio(last1, last2)
         if first_sim > 0.8 and last_sim > 0.8:
-            score += weights["first_last"] * ((first_sim + last_sim) / 2)
+            score += MATCH_WEIGHTS["first_last"] * ((first_sim + last_sim) / 2)
+    if score >= 1.0:
+        return 1.0
 
     # Organization comparison
-    org1 = contact1.get("Organization", "")
-    org2 = contact2.get("Organization", "")
     if org1 and org2:
-        org_sim = string_similarity(org1, org2)
+        org_sim = _token_ratio(org1, org2)
         if org_sim > 0.8:
-            score += weights["organization"] * org_sim
+            score += MATCH_WEIGHTS["organization"] * org_sim
 
     # Address components comparison
-    addr_components = [
-        ("ADR_Street", "street"),
-        ("ADR_Locality", "city"),
-        ("ADR_PostalCode", "postal_code"),
-        ("ADR_Country", "country"),
-    ]
-
-    for addr_field, weight_key in addr_components:
-        val1 = contact1.get(addr_field, "")
-        val2 = contact2.get(addr_field, "")
+    for (field, weight), val1, val2 in zip(
+        ADDRESS_MATCH_WEIGHTS, fields1[5:], fields2[5:]
+    ):
         if val1 and val2:
-            similarity = string_similarity(val1, val2)
+            if field in TOKEN_MATCH_FIELDS:
+                similarity = _token_ratio(val1, val2)
+            else:
+                similarity = _ratio(val1, val2)
             if similarity > 0.8:
-                score += weights[weight_key] * similarity
+                score += weight * similarity
+                if score >= 1.0:
+                    return 1.0
 
     # Normalize score to be between 0 and 1
     return min(1.0, score)
 
 
-def split_full_name(full_name):
+def split_full_name(full_name: str) -> tuple[str, str]:
     """Split a full name into first and last name components"""
     if not full_name:
         return "", ""
@@ -551,6 +961,8 @@ def process_contact(contact, validation_mode=AddressValidationMode.FULL):
     first_name = contact.get("FirstName", "")
     last_name = contact.get("LastName", "")
     structured_name = contact.get("Structured Name", "")
+    organization = contact.get("Organization", [])
+    email = contact.get("Email", [])
 
     # If no first/last name but have full name, split it
     if not (first_name or last_name) and full_name:
@@ -564,15 +976,11 @@ def process_contact(contact, validation_mode=AddressValidationMode.FULL):
         "LastName": last_name,
         "Structured Name": structured_name,
         "Organization": (
-            ", ".join(contact.get("Organization", []))
-            if isinstance(contact.get("Organization", []), list)
-            else contact.get("Organization", "").strip("[]'\"")
-        ),
-        "Email": (
-            ", ".join(contact.get("Email", []))
-            if isinstance(contact.get("Email", []), list)
-            else contact.get("Email", "")
+            ", ".join(organization)
+            if isinstance(organization, list)
+            else organization.strip("[]'\"")
         ),
+        "Email": ", ".join(email) if isinstance(email, list) else email,
         "Telephone": contact.get(
             "Telephone", []
         ),  # Changed from "Phone" to "Telephone"
@@ -625,5 +1033,7 @@ def process_contact(contact, validation_mode=AddressValidationMode.FULL):
     logging.debug(f"Processed contact: {processed}")
     return processed
 
-    logging.debug(f"Processed contact: {processed}")
-    return processed
+
+def process_contacts(contacts, validation_mode=AddressValidationMode.FULL):
+    """Process all contacts of an address book"""
+    return [process_contact(contact, validation_mode) for contact in contacts]
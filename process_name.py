@@ -2,33 +2,40 @@
 # Name Processing
 ###################
 
-from fuzzywuzzy import fuzz
-from config import NAME_PARTICLES, NAME_PREFIXES, NAME_SUFFIXES, ratio_nickname_match
+from functools import lru_cache
+from config import NAME_PARTICLES, NAME_PREFIXES, NAME_SUFFIXES
 
+def _capitalize_word(part):
+    upper = part.upper()
+    # Handle suffixes
+    if upper in NAME_SUFFIXES:
+        return upper
+    # Handle prefixes
+    if upper.rstrip(".") in NAME_PREFIXES:
+        return upper
+    # Handle particles
+    if part.lower() in NAME_PARTICLES:
+        return part.lower()
+    # Smart capitalization: only force first letter to upper, preserve rest
+    if len(part) > 1:
+        return part[0].upper() + part[1:]
+    return part.capitalize()
+
+# Full names vary more than their parts, so parts are cached separately
+@lru_cache(maxsize=100_000)
+def _capitalize_part(part):
+    # Handle hyphenated names
+    if "-" in part:
+        return "-".join(map(_capitalize_word, part.split("-")))
+    return _capitalize_word(part)
+
+# Names repeat a lot across an address book, so results are cached
+@lru_cache(maxsize=100_000)
 def capitalize_name(name):
     """Properly capitalize name parts, preserving internal casing"""
     if not name:
         return name
-
-    def cap_part(part):
-        # Handle hyphenated names
-        if "-" in part:
-            return "-".join(cap_part(p) for p in part.split("-"))
-        # Handle suffixes
-        if part.upper() in NAME_SUFFIXES:
-            return part.upper()
-        # Handle prefixes
-        if part.upper().rstrip(".") in NAME_PREFIXES:
-            return part.upper()
-        # Handle particles
-        if part.lower() in NAME_PARTICLES:
-            return part.lower()
-        # Smart capitalization: only force first letter to upper, preserve rest
-        if len(part) > 1:
-            return part[0].upper() + part[1:]
-        return part.capitalize()
-
-    return " ".join(cap_part(part) for part in name.split())
+    return " ".join(_capitalize_part(part) for part in name.split())
 
 def split_name_parts(name):
     """Split name into individual parts, handling special cases"""
@@ -37,8 +44,9 @@ def split_name_parts(name):
     # First split by commas for truly different name variants
     variants = []
     for variant in name.replace("\\,", ",").split(","):
-        # Then split each variant by spaces
-        parts = [p.strip() for p in variant.split() if p.strip()]
+        # Then split each variant by spaces; split() already drops the
+        # surrounding whitespace and empty parts
+        parts = variant.split()
         if parts:
             variants.append(parts)
     return variants
@@ -56,10 +64,11 @@ def merge_name_parts(parts_list):
                 seen_positions[part] = pos
 
     # Get unique parts and sort by their first occurrence
-    unique_parts = sorted(seen_positions.keys(), key=lambda x: seen_positions[x])
+    unique_parts = sorted(seen_positions, key=seen_positions.get)
     
     # If we have multiple completely different names, join with comma
-    if len(parts_list) > 1 and not any(set(parts_list[0]) & set(variant) for variant in parts_list[1:]):
+    first_parts = frozenset(parts_list[0])
+    if len(parts_list) > 1 and all(first_parts.isdisjoint(variant) for variant in parts_list[1:]):
         return ", ".join(" ".join(variant) for variant in parts_list)
         
     # Otherwise join as single name
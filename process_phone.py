@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 import phonenumbers
 from phonenumbers import NumberParseException
 from config import COUNTRY_PREFIXES
@@ -7,13 +8,58 @@ from config import COUNTRY_PREFIXES
 # Phone Number Processing
 ###################
 
+LEADING_00_PATTERN = re.compile(r"^00")
 
+
+def _build_prefix_trie(prefixes):
+    """Build a digit trie over country codes; "$" marks a complete code."""
+    trie = {}
+    for prefix in prefixes:
+        node = trie
+        for digit in prefix:
+            node = node.setdefault(digit, {})
+        node["$"] = True
+    return trie
+
+
+_PREFIX_TRIE = _build_prefix_trie(COUNTRY_PREFIXES)
+
+
+def _country_prefix_lengths(number):
+    """Yield the lengths of all country codes `number` starts with, shortest first."""
+    node = _PREFIX_TRIE
+    for depth, digit in enumerate(number, 1):
+        node = node.get(digit)
+        if node is None:
+            return
+        if "$" in node:
+            yield depth
+
+
+def _country_prefix_length(number):
+    """Length of the longest country code `number` starts with, or 0."""
+    return max(_country_prefix_lengths(number), default=0)
+
+
+def _is_local_form(number, prefix_length, other):
+    """Whether `other` is `number` written locally, without its country code."""
+    local = number[prefix_length:]
+    if local.startswith("0"):
+        local = local[1:]  # Remove leading 0
+    if other.startswith("0"):
+        return local == other[1:]  # Match without leading 0
+    return local == other
+
+
+# The same numbers are normalized while matching, merging and reporting, and
+# parsing them is comparatively expensive, so results are cached
+@lru_cache(maxsize=100_000)
 def normalize_phone(phone):
     """Normalize individual phone number to international format."""
     if not phone:
         return phone
     # Replace leading '00' with '+'
-    phone = re.sub(r'^00', '+', phone)
+    phone = LEADING_00_PATTERN.sub('+', phone)
     try:
         # Attempt to parse the phone number with a default region (e.g., 'DE' for Germany)
         parsed_number = phonenumbers.parse(phone, None)
@@ -57,45 +103,22 @@ def are_phones_matching(phone1, phone2):
     if n1 == n2:
         return True
 
-    # Compare without plus
-    n1_bare = n1.lstrip("+")
-    n2_bare = n2.lstrip("+")
-
-    if n1_bare == n2_bare:
-        return True
-
-    # Split the numbers into parts for comparison if they don't have a country code
-    if not n1.startswith("+") and not n2.startswith("+"):
-        n1_parts = n1_bare.split()
-        n2_parts = n2_bare.split()
-        if len(n1_parts) == len(n2_parts) and all(
-            part1 == part2 for part1, part2 in zip(n1_parts, n2_parts)
-        ):
-            return True
+    # Both numbers are in E.164 now: a single "+" followed by digits only, so
+    # they can't be equal without it either, nor differ only in spacing
+    n1_bare = n1[1:]
+    n2_bare = n2[1:]
 
     # Handle international prefix vs local format
     # e.g., +44 20 1234 5678 should match 020 1234 5678
-    for prefix in COUNTRY_PREFIXES:
-        if n1_bare.startswith(prefix):
-            local = n1_bare[len(prefix) :]
-            if local.startswith("0"):
-                local = local[1:]  # Remove leading 0
-            if n2_bare.startswith("0"):
-                if local == n2_bare[1:]:  # Match without leading 0
-                    return True
-            elif local == n2_bare:
-                return True
-        if n2_bare.startswith(prefix):
-            local = n2_bare[len(prefix) :]
-            if local.startswith("0"):
-                local = local[1:]  # Remove leading 0
-            if n1_bare.startswith("0"):
-                if local == n1_bare[1:]:  # Match without leading 0
-                    return True
-            elif local == n1_bare:
-                return True
-
-    return False
+    # Every country code either number starts with is tried, found by a
+    # single walk down the prefix trie instead of testing each code
+    return any(
+        _is_local_form(n1_bare, length, n2_bare)
+        for length in _country_prefix_lengths(n1_bare)
+    ) or any(
+        _is_local_form(n2_bare, length, n1_bare)
+        for length in _country_prefix_lengths(n2_bare)
+    )
 
 
 def any_phones_match(contact1, contact2):
@@ -106,6 +129,9 @@ def any_phones_match(contact1, contact2):
     phones1 = normalize_phone_list(contact1.get("Telephone", ""))
     phones2 = normalize_phone_list(contact2.get("Telephone", ""))
 
+    # Both lists are in E.164 already, so a shared number is a hash lookup
+    if not set(phones1).isdisjoint(phones2):
+        return True
     return any(
         are_phones_matching(phone1, phone2) for phone1 in phones1 for phone2 in phones2
     )
@@ -117,11 +143,8 @@ def get_bare_numbers(phone_list):
     for phone in phone_list:
         # Remove common prefixes
         clean = phone.lstrip("+")
-        # Remove country code if present
-        for prefix in sorted(COUNTRY_PREFIXES.keys(), key=len, reverse=True):
-            if clean.startswith(prefix):
-                clean = clean[len(prefix) :]
-                break
+        # Remove country code if present, preferring the longest one
+        clean = clean[_country_prefix_length(clean) :]
         # Remove leading zeros
         clean = clean.lstrip("0")
         if clean:
@@ -5,10 +5,13 @@ from collections import defaultdict
 from pathlib import Path
 from process_contact import (
     merge_names,
-    are_phones_matching,
+    merge_duplicates,
+    is_duplicate,
     is_duplicate_with_confidence,
 )
+from process_phone import are_phones_matching
 from process_address import normalize_address, AddressValidationMode
+from validation import generate_merge_validation
 
 # Load environment variables
 load_dotenv()
@@ -376,6 +379,185 @@ def test_phone_matching():
         raise
 
 
+def test_merge_duplicates():
+    try:
+        logger.info("TEST SUITE: MERGE DUPLICATES")
+        tests_run = tests_passed = 0
+
+        # Test 1: Shared email address
+        logger.info("\tTEST 1/5: Shared email address")
+        logger.info("\tInput: 'Sarah Johnson' + 'Sarah J', same email")
+        contacts = [
+            {"Full Name": "Sarah Johnson", "Email": "sarah@globaltech.com"},
+            {"Full Name": "Sarah J", "Email": "SARAH@globaltech.com "},
+        ]
+        result, report = merge_duplicates(contacts, AddressValidationMode.NONE)
+        logger.info(f"\tOutput: {result}")
+        tests_run += 1
+        if len(result) != 1:
+            raise TestFailureException(f"Shared email test failed. Got: {result}")
+        tests_passed += 1
+        logger.info("\tStatus: PASSED")
+
+        # Test 2: Different people sharing one address; the address alone
+        # identifies the contact, so they are merged, keeping both names
+        logger.info("\tTEST 2/5: Different people sharing one email address")
+        logger.info("\tInput: 'Anna Berg' + 'Max Mustermann', same email")
+        contacts = [
+            {"Full Name": "Anna Berg", "Email": "family@example.com"},
+            {"Full Name": "Max Mustermann", "Email": "family@example.com"},
+        ]
+        result, report = merge_duplicates(contacts, AddressValidationMode.NONE)
+        logger.info(f"\tOutput: {result}")
+        tests_run += 1
+        if len(result) != 1 or result[0]["Full Name"] != "Anna Berg, Max Mustermann":
+            raise TestFailureException(f"Shared address test failed. Got: {result}")
+        tests_passed += 1
+        logger.info("\tStatus: PASSED")
+
+        # Test 3: Merge report of merged groups and every contact's group
+        logger.info("\tTEST 3/5: Merge report")
+        logger.info("\tInput: two contacts sharing an email + one unrelated")
+        contacts = [
+            {"Full Name": "John Smith", "Email": "john@email.com"},
+            {"Full Name": "Maria Lopez", "Email": "maria@email.com"},
+            {"Full Name": "JOHN SMITH", "Email": "john@email.com"},
+        ]
+        result, report = merge_duplicates(contacts, AddressValidationMode.NONE)
+        logger.info(f"\tOutput: {result}, {report}")
+        tests_run += 1
+        groups = [[c["Full Name"] for c in group] for group in report["groups"]]
+        if (
+            len(result) != 2
+            or groups != [["John Smith", "JOHN SMITH"]]
+            or list(report["map"]) != [0, -1, 0]
+        ):
+            raise TestFailureException(f"Merge report test failed. Got: {report}")
+        tests_passed += 1
+        logger.info("\tStatus: PASSED")
+
+        # Test 4: Contacts without a name are never name-matched
+        logger.info("\tTEST 4/5: Empty names")
+        logger.info("\tInput: two unrelated contacts with an empty Full Name")
+        contacts = [
+            {"Full Name": "", "Telephone": ["+4930123456"], "Email": "a@example.com"},
+            {"Full Name": "", "Telephone": ["+4940654321"], "Email": "b@example.com"},
+        ]
+        result, report = merge_duplicates(contacts, AddressValidationMode.NONE)
+        logger.info(f"\tOutput: {result}")
+        tests_run += 1
+        if len(result) != 2 or any(c.get("Full Name") != "" for c in result):
+            raise TestFailureException(f"Empty name test failed. Got: {result}")
+        tests_passed += 1
+        logger.info("\tStatus: PASSED")
+
+        # Test 5: Email as parsed from vCards, a list of addresses
+        logger.info("\tTEST 5/5: List-valued email")
+        logger.info("\tInput: 'Tom Baker' + 'Tom Baker', email lists sharing one address")
+        contacts = [
+            {"Full Name": "Tom Baker", "Email": ["tom@home.com", "tom@work.com"]},
+            {"Full Name": "Tom Baker", "Email": ["TOM@work.com"], "Organization": ["ACME"]},
+        ]
+        result, report = merge_duplicates(contacts, AddressValidationMode.NONE)
+        logger.info(f"\tOutput: {result}")
+        tests_run += 1
+        if len(result) != 1 or result[0]["Match Confidence"] <= 0:
+            raise TestFailureException(f"List-valued email test failed. Got: {result}")
+        tests_passed += 1
+        logger.info("\tStatus: PASSED")
+
+        success_rate = (tests_passed / tests_run) * 100
+        logger.results(
+            f"Test results: {tests_passed}/{tests_run} passed ({success_rate:.0f}%)"
+        )
+        return True
+    except Exception:
+        logger.error("Merge duplicates tests failed", exc_info=True)
+        raise
+
+
+def test_nickname_matching():
+    try:
+        logger.info("TEST SUITE: NICKNAME MATCHING")
+        tests_run = tests_passed = 0
+
+        cases = [
+            ("Bob Smith", "Robert Smith", True, "Nickname as first name"),
+            ("Dave Lee", "David Lee", True, "Short nickname"),
+            ("Smith, Bob", "Robert Smith", True, "Nickname in 'Last, First' form"),
+            ("Bob Smith", "Alice Smith", False, "Unrelated first names"),
+            ("Kevin Sam", "Kevin Samuel", False, "Surname like a nickname"),
+            ("Anna Bill", "Anna William", False, "Surname that is a nickname"),
+            ("Jon Smith", "John Smith", True, "Similar first names"),
+            ("Alex Smith", "Alexandra Smith", False, "Short form of several names"),
+            ("Mike Smith", "Michaela Smith", False, "Nickname close to another name"),
+        ]
+        for number, (name1, name2, should_match, description) in enumerate(cases, 1):
+            logger.info(f"\tTEST {number}/{len(cases)}: {description}")
+            logger.info(f"\tInput: '{name1}' vs '{name2}'")
+            contacts = [{"Full Name": name1}, {"Full Name": name2}]
+            result = is_duplicate(*contacts)
+            # merge_duplicates also has to find the pair through its name index
+            merged, _ = merge_duplicates(contacts, AddressValidationMode.NONE)
+            logger.info(f"\tResult: {result}, {len(merged)} contact(s) after merge")
+            tests_run += 1
+            if result != should_match or (len(merged) == 1) != should_match:
+                raise TestFailureException(f"{description} test failed")
+            tests_passed += 1
+            logger.info("\tStatus: PASSED")
+
+        success_rate = (tests_passed / tests_run) * 100
+        logger.results(
+            f"Test results: {tests_passed}/{tests_run} passed ({success_rate:.0f}%)"
+        )
+        return True
+    except Exception:
+        logger.error("Nickname matching tests failed", exc_info=True)
+        raise
+
+
+def test_merge_validation():
+    try:
+        logger.info("TEST SUITE: MERGE VALIDATION")
+        tests_run = tests_passed = 0
+
+        # Test 1: One row per merged group, then one per unmerged contact
+        logger.info("\tTEST 1/1: Merge report rows")
+        logger.info("\tInput: two 'John Smith' contacts sharing an email + one unrelated")
+        contacts = [
+            {"Full Name": "John Smith", "Email": "john@email.com", "Telephone": ["+4930123456"]},
+            {"Full Name": "Maria Lopez", "Email": "maria@email.com"},
+            {"Full Name": "John Smith", "Email": "john@email.com", "Telephone": ["+4940654321"]},
+        ]
+        result, report = merge_duplicates(contacts, AddressValidationMode.NONE)
+        rows = generate_merge_validation(
+            contacts, result, output_file=None, merge_report=report
+        ).to_dict("records")
+        logger.info(f"\tOutput: {rows}")
+        tests_run += 1
+        expected = [
+            ("John Smith", "John Smith", "+4930123456, +4940654321"),
+            ("Maria Lopez", "Maria Lopez", ""),
+        ]
+        actual = [
+            (row["Original Names"], row["Merged Name"], row["Merged Phone Numbers"])
+            for row in rows
+        ]
+        if actual != expected or rows[0]["Match Confidence"] != result[0]["Match Confidence"]:
+            raise TestFailureException(f"Merge report rows test failed. Got: {rows}")
+        tests_passed += 1
+        logger.info("\tStatus: PASSED")
+
+        success_rate = (tests_passed / tests_run) * 100
+        logger.results(
+            f"Test results: {tests_passed}/{tests_run} passed ({success_rate:.0f}%)"
+        )
+        return True
+    except Exception:
+        logger.error("Merge validation tests failed", exc_info=True)
+        raise
+
+
 def format_address_for_display(addr_dict):
     """Format address dictionary for human readable output"""
     vcard = addr_dict["vcard"]
@@ -490,6 +672,9 @@ def run_tests():
         logger.info("STARTING TEST SUITES")  # Changed from debug to info
         test_merge_names()
         test_phone_matching()
+        test_merge_duplicates()
+        test_nickname_matching()
+        test_merge_validation()
         test_address_processing()
         logger.results("ALL TEST SUITES COMPLETED")
         return True